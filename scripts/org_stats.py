@@ -8,26 +8,44 @@ Orgプロフィール用のREADMEを自動更新するスクリプト。
 - コントリビュータランキング
 - 衛星別リポジトリ一覧
 を生成し、README内の <!-- ORG-STATS:START --> ... <!-- ORG-STATS:END --> を置き換える。
-さらに言語サマリの円グラフSVGを保存する。
+さらに言語サマリの円グラフSVGを保存する（標準ライブラリのみで動く）。
 """
 
 import os
 import sys
 import json
 import math
-from datetime import datetime, timezone
-from urllib import request
+import re
+import glob
+import hashlib
+import shutil
+import tempfile
+import queue
+import time
+import functools
+import heapq
+import http.client
+from datetime import datetime, timedelta, timezone
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+# orjson があればバイト列のまま高速にパースする（無くても動く）
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads  # json.loads も bytes をそのまま受け取れる
 
 # ====== 設定（環境変数から取るように変更） ======
 ORG_NAME = os.environ.get("ORG_NAME", "").strip()
 TOKEN = os.environ.get("GITHUB_TOKEN", "").strip()
 README_PATH = os.environ.get("README_PATH", "README.md").strip()
 LANG_SVG_PATH = os.environ.get("LANG_SVG_PATH", "assets/langs.svg").strip()
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache/org_stats").strip()
+# フォークも言語/コントリビュータ集計に含めるか（既定は含めない）
+INCLUDE_FORKS = os.environ.get("INCLUDE_FORKS", "").strip().lower() in ("1", "true", "yes")
 
 BLOCK_START = "<!-- ORG-STATS:START -->"
 BLOCK_END = "<!-- ORG-STATS:END -->"
@@ -42,6 +60,15 @@ SATELLITE_GROUPS = {
 }
 OTHER_GROUP = "OTHERS"
 
+# 小文字化したリポジトリ名に当てる正規表現を衛星ごとに1本ずつ用意しておく
+SATELLITE_PATTERNS = [
+    (sat, re.compile("|".join(re.escape(kw) for kw in sorted({kw.lower() for kw in kws}))))
+    for sat, kws in SATELLITE_GROUPS.items()
+]
+
+# contributors (REST) をリポジトリごとに取る際の同時実行数（セカンダリレート制限に配慮して控えめに）
+MAX_WORKERS = 10
+
 # ==== GitHub言語カラー表を読み込む ====
 GITHUB_LANG_COLORS = {}
 try:
@@ -53,134 +80,409 @@ except Exception as e:
     print(f"[WARN] failed to load github_colors.json: {e}")
     GITHUB_LANG_COLORS = {}
 
+# 色表にない言語用のフォールバック（matplotlib の tab10 と同じ並び）
+DEFAULT_COLORS = [
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+    "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf",
+]
+
+
+# ========== ディスクキャッシュ ==========
+ETAG_INDEX_PATH = os.path.join(CACHE_DIR, "etag.json")
+
+
+def write_json_atomic(path: str, obj):
+    """一時ファイルに書いてから os.replace で差し替える（途中で落ちても壊れたJSONを残さない）"""
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=d, delete=False) as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(f.name, path)
+
+
+def load_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+# { url: {"etag": ..., "body": キャッシュ本体のパス} }
+ETAGS = load_json(ETAG_INDEX_PATH, {})
+
+
+def contributors_url(owner: str, name: str):
+    return f"https://api.github.com/repos/{owner}/{name}/contributors?per_page=100"
+
+
+def save_cache(owner: str, names):
+    """
+    ETag表を保存する。今回の集計対象に無いリポジトリ（削除・改名・アーカイブなど）の
+    ETag・ボディ・contributorsキャッシュはここで消しておく。
+    """
+    live_urls = {contributors_url(owner, name) for name in names}
+    for url in list(ETAGS):
+        if url not in live_urls:
+            del ETAGS[url]
+
+    bodies = {e["body"] for e in ETAGS.values()}
+    for path in glob.glob(os.path.join(CACHE_DIR, "etag", "*.json")):
+        if path not in bodies:
+            os.remove(path)
+    for path in glob.glob(os.path.join(CACHE_DIR, "*.contrib.json")):
+        name = os.path.basename(path)[:-len(".contrib.json")].rpartition("@")[0]
+        if name not in names:
+            os.remove(path)
+
+    write_json_atomic(ETAG_INDEX_PATH, ETAGS)
+
 
 # ========== GitHub API helper ==========
+API_HOST = "api.github.com"
+# api.github.com へのkeep-alive接続のプール（全スレッド共有、待機中は最大 MAX_WORKERS 本）
+_idle_conns = queue.LifoQueue(maxsize=MAX_WORKERS)
+
+# X-RateLimit-Remaining がこれを下回ったらリセット時刻まで待ってから次へ進む
+RATE_LIMIT_MIN = 10
+# レート制限(403/429)に当たったときのやり直し回数
+MAX_RETRIES = 3
+
+
+def _drain_idle_conns():
+    """長く待った後のプール内の接続はサーバ側で切られているので捨てる"""
+    while True:
+        try:
+            _idle_conns.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+def _seconds_until(reset):
+    return max(0, int(reset) - int(time.time())) + 1 if reset else 0
+
+
+def rate_limited(send):
+    """
+    レスポンスの X-RateLimit-Remaining / X-RateLimit-Reset / Retry-After を見て待つデコレータ。
+    - 残りが RATE_LIMIT_MIN 未満なら、無駄打ちする前にリセット時刻まで寝る
+    - 403/429 でレート制限に当たったら待ってから最大 MAX_RETRIES 回やり直す（指数バックオフ）
+    - GraphQL は制限に当たっても HTTP 200 + errors[].type == "RATE_LIMITED" を返すので、それも同様に扱う
+    """
+    @functools.wraps(send)
+    def wrapper(*args, **kwargs):
+        for attempt in range(MAX_RETRIES + 1):
+            status, headers, data = send(*args, **kwargs)
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            retry_after = headers.get("Retry-After")
+
+            limited = status in (403, 429) and (retry_after or remaining == "0")
+            if status < 300 and remaining == "0" and b'"RATE_LIMITED"' in data:
+                limited = True
+            if limited and attempt < MAX_RETRIES:
+                wait = max(int(retry_after) if retry_after else _seconds_until(reset), 2 ** attempt)
+                print(f"[WARN] rate limited (HTTP {status}), retry in {wait}s")
+                time.sleep(wait)
+                _drain_idle_conns()
+                continue
+
+            if not limited and remaining is not None and int(remaining) < RATE_LIMIT_MIN:
+                wait = _seconds_until(reset)
+                print(f"[WARN] rate limit remaining={remaining}, sleep {wait}s until reset")
+                time.sleep(wait)
+                _drain_idle_conns()
+            return status, headers, data
+
+    return wrapper
+
+
+@rate_limited
+def _send(method: str, path: str, headers: dict, body: bytes = None):
+    """
+    共有プールからkeep-alive済みのHTTPS接続を借りて1リクエスト送り、終わったら返す。
+    TLSハンドシェイクは新しい接続を張るときだけ（GraphQLで温まった接続もcontributorsで再利用される）。
+    """
+    headers = {
+        "Authorization": f"Bearer {TOKEN}",
+        "User-Agent": "org-stats",
+        **headers,
+    }
+    for attempt in range(2):
+        conn = None
+        if attempt == 0:
+            try:
+                conn = _idle_conns.get_nowait()
+            except queue.Empty:
+                pass
+        if conn is None:
+            # やり直しは必ず新しい接続で（プールに他の死んだ接続が残っていても巻き込まれない）
+            conn = http.client.HTTPSConnection(API_HOST, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            result = resp.status, resp.headers, resp.read()
+        except (http.client.HTTPException, ConnectionError):
+            # アイドル中にサーバ側で切られた接続は張り直して1回だけやり直す
+            conn.close()
+            if attempt:
+                raise
+            continue
+        except OSError:
+            # タイムアウトやSSLエラーなどはやり直さないが、接続は閉じておく
+            conn.close()
+            raise
+        try:
+            _idle_conns.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        return result
+
+
 def github_api(url: str):
+    """
+    REST APIをGETする。前回のETagが分かっていれば If-None-Match を付け、
+    304 Not Modified ならキャッシュ済みのボディを返す（304はレート制限に数えられない）。
+    """
     if not TOKEN:
         raise RuntimeError("GITHUB_TOKEN is not set")
 
-    req = request.Request(url)
-    req.add_header("Authorization", f"Bearer {TOKEN}")
-    req.add_header("Accept", "application/vnd.github+json")
-    req.add_header("X-GitHub-Api-Version", "2022-11-28")
-    with request.urlopen(req) as resp:
-        data = resp.read()
-    return json.loads(data.decode("utf-8"))
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    cached = ETAGS.get(url)
+    if cached and os.path.exists(cached["body"]):
+        headers["If-None-Match"] = cached["etag"]
+
+    parts = urlsplit(url)
+    status, resp_headers, data = _send("GET", f"{parts.path}?{parts.query}", headers)
+    if status == 304:
+        return load_json(cached["body"], None)
+    if status == 204:
+        return None
+    if status >= 300:
+        raise HTTPError(url, status, http.client.responses.get(status, ""), resp_headers, None)
+
+    body = _loads(data)
+    etag = resp_headers.get("ETag")
+    if etag:
+        body_path = os.path.join(CACHE_DIR, "etag", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+        write_json_atomic(body_path, body)
+        ETAGS[url] = {"etag": etag, "body": body_path}
+    return body
+
+
+def github_graphql(query: str, variables: dict):
+    if not TOKEN:
+        raise RuntimeError("GITHUB_TOKEN is not set")
+
+    body = json.dumps({"query": query, "variables": variables}).encode("utf-8")
+    status, resp_headers, data = _send("POST", "/graphql", {"Content-Type": "application/json"}, body)
+    if status >= 300:
+        raise HTTPError("https://api.github.com/graphql", status, http.client.responses.get(status, ""),
+                        resp_headers, None)
+    payload = _loads(data)
+    if payload.get("errors"):
+        raise RuntimeError(f"GraphQL error: {payload['errors']}")
+    return payload["data"]
+
+
+# 1リクエストで最大100リポジトリ分のメタデータと言語内訳をまとめて取る
+ORG_REPOS_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor) {
+      pageInfo { endCursor hasNextPage }
+      nodes {
+        name
+        url
+        pushedAt
+        stargazerCount
+        isArchived
+        isDisabled
+        isFork
+        diskUsage
+        defaultBranchRef { name }
+        primaryLanguage { name }
+        languages(first: 100) { edges { size node { name } } }
+      }
+    }
+  }
+}
+"""
 
 
-def fetch_all_repos(org: str):
+def fetch_org_graphql(org: str):
+    """
+    組織の全リポジトリをGraphQLで取得する。
+    返す dict は REST (/orgs/{org}/repos) と同じキー名に揃え、
+    言語内訳を "languages" ({言語名: バイト数}) として持たせる。
+    """
     repos = []
-    page = 1
-    per_page = 100
+    cursor = None
     while True:
-        url = f"https://api.github.com/orgs/{org}/repos?per_page={per_page}&page={page}"
-        data = github_api(url)
-        if not data:
-            break
-        repos.extend(data)
-        if len(data) < per_page:
+        data = github_graphql(ORG_REPOS_QUERY, {"org": org, "cursor": cursor})
+        conn = data["organization"]["repositories"]
+        for n in conn["nodes"]:
+            repos.append({
+                "name": n["name"],
+                "html_url": n["url"],
+                "pushed_at": n["pushedAt"],
+                "stargazers_count": n["stargazerCount"],
+                "language": (n["primaryLanguage"] or {}).get("name"),
+                "archived": n["isArchived"],
+                "disabled": n["isDisabled"],
+                "fork": n["isFork"],
+                "size": n["diskUsage"] or 0,
+                "default_branch": (n["defaultBranchRef"] or {}).get("name"),
+                "languages": {e["node"]["name"]: e["size"] for e in n["languages"]["edges"]},
+            })
+        if not conn["pageInfo"]["hasNextPage"]:
             break
-        page += 1
+        cursor = conn["pageInfo"]["endCursor"]
     return repos
 
 
-def fetch_repo_languages(owner: str, repo: str):
-    url = f"https://api.github.com/repos/{owner}/{repo}/languages"
-    try:
-        return github_api(url)
-    except Exception:
-        return {}
-
-
-def fetch_repo_contributors(owner: str, repo: str):
-    url = f"https://api.github.com/repos/{owner}/{repo}/contributors?per_page=100"
+def fetch_repo_contributors(owner: str, repo: dict):
+    """
+    contributors は (repo, pushed_at) が同じなら変わらないので、
+    CACHE_DIR/{repo}@{pushed_at}.contrib.json にキャッシュする。
+    """
+    name = repo["name"]
+    key = f"{name}@{repo['pushed_at'] or '-'}".replace(":", "-")
+    cache_path = os.path.join(CACHE_DIR, f"{key}.contrib.json")
+    cached = load_json(cache_path, None)
+    if cached is not None:
+        return cached
+
+    url = contributors_url(owner, name)
     try:
-        return github_api(url)
-    except Exception:
-        return []
+        # 空リポジトリは 204 No Content が返る
+        contribs = github_api(url) or []
+    except HTTPError as e:
+        # 消えた/見えないリポジトリだけは空扱い。レート制限などは握りつぶさない
+        if e.code in (404, 451):
+            return []
+        raise
+
+    # 古い pushed_at のキャッシュは不要なので消しておく
+    for old in glob.glob(os.path.join(CACHE_DIR, f"{glob.escape(name)}@*.contrib.json")):
+        os.remove(old)
+    write_json_atomic(cache_path, contribs)
+    return contribs
+
+
+def _has_content(r):
+    """
+    集計対象にするリポジトリか。
+    アーカイブ・無効化されたもの、空のもの（size 0 やデフォルトブランチ無し）、
+    既定ではフォークも除く。空リポジトリは言語もcontributorsも無いのでAPIを叩くだけ無駄。
+    """
+    if r.get("fork") and not INCLUDE_FORKS:
+        return False
+    if r.get("archived") or r.get("disabled"):
+        return False
+    return r.get("size", 0) > 0 and bool(r.get("default_branch"))
 
 
 # ========== 言語集計 ==========
-def aggregate_languages(repos, owner: str):
+def aggregate_languages(repos):
     counter = Counter()
-    for r in repos:
-        langs = fetch_repo_languages(owner, r["name"])
-        for lang, size in langs.items():
+    for r in (r for r in repos if _has_content(r)):
+        for lang, size in r["languages"].items():
             counter[lang] += size
     return counter
 
 
+def _text_width(text: str, font_size: float) -> float:
+    """
+    SVGテキスト幅の概算（フォントを実測できないので多めに見積もる）。
+    sans-serif の平均字幅を 0.62em、全角文字を 1em とする。
+    """
+    return sum(font_size if ord(c) >= 0x2E80 else 0.62 * font_size for c in text)
+
+
 def save_language_svg(lang_counter, path: str):
     """
     言語カウンタから円グラフSVGを生成して保存する。
-    - ラベルを外に出して線でつなぐ
+    - ラベルを外に出して線でつなぐ（凡例はラベルと重複するので付けない）
     - GitHub公式に近い色を使う（ある分だけ）
+    matplotlibは使わず、SVGを文字列で直接組み立てる。
     """
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
-    fig, ax = plt.subplots(figsize=(6, 4))
+    width, height = 540, 340
+    cx, cy, r = 270, height / 2, 110
+    font_size = 11
+    # ラベルがキャンバスからはみ出す分だけ viewBox を左（負のx）・右へ広げる
+    left, right = 0.0, float(width)
+    parts = []
 
     if not lang_counter:
-        ax.text(0.5, 0.5, "No language data", ha="center", va="center")
-        fig.savefig(path, format="svg", bbox_inches="tight")
-        return
-
-    most_common = lang_counter.most_common(8)
-    labels = [k for k, _ in most_common]
-    sizes = [v for _, v in most_common]
-
-    colors = [GITHUB_LANG_COLORS.get(lang, None) for lang in labels]
-
-    # まず普通にパイを描く
-    wedges, _ = ax.pie(
-        sizes,
-        colors=colors,
-        startangle=90,
-        radius=1.0
-    )
-
-    # ラベル＋線
-    kw = dict(arrowprops=dict(arrowstyle="-", lw=0.8),
-              va="center",
-              fontsize=8)
-    total = sum(sizes)
-    for i, w in enumerate(wedges):
-        ang = (w.theta2 + w.theta1) / 2.0
-        # 円周上の点
-        x = math.cos(math.radians(ang))
-        y = math.sin(math.radians(ang))
-        # 外に出す位置
-        x_text = 1.25 * x
-        y_text = 1.25 * y
-        ha = "left" if x > 0 else "right"
-        percent = sizes[i] / total * 100.0
-        ax.annotate(
-            f"{labels[i]} ({percent:.1f}%)",
-            xy=(x, y),
-            xytext=(x_text, y_text),
-            ha=ha,
-            **kw
-        )
-
-    ax.set_aspect("equal")
-
-    # 凡例も右に出すと読みやすい
-    ax.legend(
-        wedges,
-        labels,
-        title="Languages",
-        loc="center left",
-        bbox_to_anchor=(1.05, 0.0, 0.4, 1.0)
+        parts.append(f'<text x="{width / 2}" y="{height / 2}" text-anchor="middle">No language data</text>')
+    else:
+        most_common = lang_counter.most_common(8)
+        labels = [k for k, _ in most_common]
+        sizes = [v for _, v in most_common]
+        total = sum(sizes)
+        colors = [GITHUB_LANG_COLORS.get(lang) or DEFAULT_COLORS[i % len(DEFAULT_COLORS)]
+                  for i, lang in enumerate(labels)]
+
+        # 12時の位置から反時計回りに描く（数学座標で角度を持ち、SVGではyを反転）
+        def point(deg, radius):
+            rad = math.radians(deg)
+            return cx + radius * math.cos(rad), cy - radius * math.sin(rad)
+
+        theta1 = 90.0
+        for i, size in enumerate(sizes):
+            theta2 = theta1 + 360.0 * size / total
+            if len(sizes) == 1:
+                parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{colors[i]}"/>')
+            else:
+                x1, y1 = point(theta1, r)
+                x2, y2 = point(theta2, r)
+                large = 1 if theta2 - theta1 > 180 else 0
+                parts.append(
+                    f'<path d="M {cx},{cy} L {x1:.2f},{y1:.2f} A {r},{r} 0 {large},0 {x2:.2f},{y2:.2f} Z" '
+                    f'fill="{colors[i]}"/>'
+                )
+
+            # ラベル＋線
+            ang = (theta1 + theta2) / 2.0
+            x, y = point(ang, r)
+            x_text, y_text = point(ang, 1.25 * r)
+            anchor = "start" if x > cx else "end"
+            percent = size / total * 100.0
+            label = f"{labels[i]} ({percent:.1f}%)"
+            if anchor == "end":
+                left = min(left, x_text - _text_width(label, font_size) - 4)
+            else:
+                right = max(right, x_text + _text_width(label, font_size) + 4)
+            parts.append(f'<line x1="{x:.2f}" y1="{y:.2f}" x2="{x_text:.2f}" y2="{y_text:.2f}" stroke="#000" stroke-width="0.8"/>')
+            parts.append(
+                f'<text x="{x_text:.2f}" y="{y_text:.2f}" text-anchor="{anchor}" dominant-baseline="middle" '
+                f'font-size="{font_size}">{escape(label)}</text>'
+            )
+            theta1 = theta2
+
+    view_w = right - left
+    header = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{view_w:.0f}" height="{height}" '
+        f'viewBox="{left:.2f} 0 {view_w:.2f} {height}" font-family="sans-serif">'
     )
-
-    fig.savefig(path, format="svg", bbox_inches="tight")
+    parts = [header] + parts + ["</svg>"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts) + "\n")
 
 
 # ========== Contributors ==========
 def aggregate_contributors(repos, owner: str, top_n: int = 10):
     total = Counter()
-    for r in repos:
-        contribs = fetch_repo_contributors(owner, r["name"])
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        results = list(ex.map(lambda r: fetch_repo_contributors(owner, r),
+                              (r for r in repos if _has_content(r))))
+    for contribs in results:
         for c in contribs:
             login = c.get("login")
             cnt = c.get("contributions", 0)
@@ -198,8 +500,8 @@ def group_repos_by_satellite(repos):
         name = r["name"]
         lower = name.lower()
         put = False
-        for sat, kws in SATELLITE_GROUPS.items():
-            if any(kw.lower() in lower for kw in kws):
+        for sat, pattern in SATELLITE_PATTERNS:
+            if pattern.search(lower):
                 grouped[sat].append(r)
                 put = True
                 break
@@ -210,61 +512,67 @@ def group_repos_by_satellite(repos):
 
 # ========== Markdown builders ==========
 def make_recent_repos_table(repos, limit=10):
-    lines = []
-    lines.append("### 📦 最近動いたリポジトリ\n")
-    lines.append("| Repo | Pushed | Stars | Lang |\n")
-    lines.append("|------|--------|-------|------|\n")
-    for r in repos[:limit]:
-        lines.append(
-            f"| [{r['name']}]({r['html_url']}) | {(r['pushed_at'] or '-')[:10]} | ⭐ {r['stargazers_count']} | {r['language'] or '-'} |\n"
-        )
-    lines.append("\n")
-    return "".join(lines)
+    rows = "".join(
+        f"| [{r['name']}]({r['html_url']}) | {(r['pushed_at'] or '-')[:10]} | ⭐ {r['stargazers_count']} | {r['language'] or '-'} |\n"
+        for r in repos[:limit]
+    )
+    return (
+        "### 📦 最近動いたリポジトリ\n"
+        "| Repo | Pushed | Stars | Lang |\n"
+        "|------|--------|-------|------|\n"
+        f"{rows}\n"
+    )
 
 
 def make_language_section(lang_counter):
-    lines = []
-    lines.append("### 🗣️ Language Summary (org-wide)\n")
     if not lang_counter:
-        lines.append("言語データが取得できませんでした。\n\n")
-        return "".join(lines)
+        return "### 🗣️ Language Summary (org-wide)\n言語データが取得できませんでした。\n\n"
 
     total = sum(lang_counter.values())
-    lines.append("| Language | Bytes | Ratio |\n")
-    lines.append("|----------|-------|-------|\n")
-    for lang, size in lang_counter.most_common(10):
-        ratio = (size / total) * 100 if total else 0
-        lines.append(f"| {lang} | {size} | {ratio:.1f}% |\n")
-    lines.append("\n")
-    lines.append("※ グラフ版は `../assets/langs.svg` を参照\n\n")
-    return "".join(lines)
+    rows = "".join(
+        f"| {lang} | {size} | {(size / total) * 100 if total else 0:.1f}% |\n"
+        for lang, size in lang_counter.most_common(10)
+    )
+    return (
+        "### 🗣️ Language Summary (org-wide)\n"
+        "| Language | Bytes | Ratio |\n"
+        "|----------|-------|-------|\n"
+        f"{rows}\n"
+        "※ グラフ版は `../assets/langs.svg` を参照\n\n"
+    )
 
 
 def make_contributors_section(top_contribs):
-    lines = []
-    lines.append("### 🧑‍💻 Top Contributors (all repos)\n")
     if not top_contribs:
-        lines.append("データがありませんでした。\n\n")
-        return "".join(lines)
-    lines.append("| User | Contributions |\n")
-    lines.append("|------|----------------|\n")
-    for login, cnt in top_contribs:
-        lines.append(f"| @{login} | {cnt} |\n")
-    lines.append("\n")
-    return "".join(lines)
+        return "### 🧑‍💻 Top Contributors (all repos)\nデータがありませんでした。\n\n"
+
+    rows = "".join(f"| @{login} | {cnt} |\n" for login, cnt in top_contribs)
+    return (
+        "### 🧑‍💻 Top Contributors (all repos)\n"
+        "| User | Contributions |\n"
+        "|------|----------------|\n"
+        f"{rows}\n"
+    )
 
 
 def make_satellite_section(grouped):
-    lines = []
-    lines.append("### 🛰️ Satellite Projects\n")
+    sections = []
     for sat, repos in grouped.items():
         if not repos:
             continue
-        lines.append(f"#### {sat}\n")
-        for r in sorted(repos, key=lambda x: x["name"].lower()):
-            lines.append(f"- [{r['name']}]({r['html_url']})\n")
-        lines.append("\n")
-    return "".join(lines)
+        rows = "".join(f"- [{r['name']}]({r['html_url']})\n" for r in sorted(repos, key=lambda x: x["name"].lower()))
+        sections.append(f"#### {sat}\n{rows}\n")
+    return f"### 🛰️ Satellite Projects\n{''.join(sections)}"
+
+
+def _matches_fragments(text: str, parts):
+    """parts をつなげたものが text と一致するか（つなげた文字列は作らず、先頭から順に照合する）"""
+    pos = 0
+    for part in parts:
+        if not text.startswith(part, pos):
+            return False
+        pos += len(part)
+    return pos == len(text)
 
 
 def main():
@@ -273,33 +581,29 @@ def main():
         sys.exit(1)
 
     print(f"[INFO] fetch repos for org={ORG_NAME}")
-    repos = fetch_all_repos(ORG_NAME)
+    repos = fetch_org_graphql(ORG_NAME)
     if not repos:
         print("[WARN] no repos found")
         sys.exit(0)
 
-    # 最近順
-    repos.sort(key=lambda r: r["pushed_at"] or "", reverse=True)
+    # 最近順（表に出す上位10件だけ取り出す。全件ソートはしない）
+    recent = heapq.nlargest(10, repos, key=lambda r: r["pushed_at"] or "")
 
-    # 直近30日
-    now = datetime.now(timezone.utc)
-    active_30d = 0
-    for r in repos:
-        if not r["pushed_at"]:
-            continue
-        dt = datetime.fromisoformat(r["pushed_at"].replace("Z", "+00:00"))
-        if (now - dt).days <= 30:
-            active_30d += 1
+    # 直近30日（経過日数 <= 30 日）
+    # pushed_at は "YYYY-MM-DDTHH:MM:SSZ" なので文字列比較で時刻順になる。
+    threshold = (datetime.now(timezone.utc) - timedelta(days=31)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    active_30d = sum(1 for r in repos if (r["pushed_at"] or "") > threshold)
 
     # 言語
     print("[INFO] aggregate languages")
-    lang_counter = aggregate_languages(repos, ORG_NAME)
+    lang_counter = aggregate_languages(repos)
     save_language_svg(lang_counter, LANG_SVG_PATH)
     print(f"[INFO] saved svg -> {LANG_SVG_PATH}")
 
     # contributors
     print("[INFO] aggregate contributors")
     top_contribs = aggregate_contributors(repos, ORG_NAME, top_n=10)
+    save_cache(ORG_NAME, {r["name"] for r in repos if _has_content(r)})
 
     # 衛星
     grouped = group_repos_by_satellite(repos)
@@ -311,13 +615,11 @@ def main():
     md.append(f"最終更新: {now_iso}\n\n")
     md.append(f"- リポジトリ総数: **{len(repos)}**\n")
     md.append(f"- 直近30日で更新があったリポジトリ: **{active_30d}**\n\n")
-    md.append(make_recent_repos_table(repos, limit=10))
+    md.append(make_recent_repos_table(recent, limit=10))
     md.append(make_language_section(lang_counter))
     md.append(make_contributors_section(top_contribs))
     md.append(make_satellite_section(grouped))
 
-    new_block = "".join(md)
-
     # READMEを差し替え
     with open(README_PATH, "r", encoding="utf-8") as f:
         readme = f.read()
@@ -327,16 +629,26 @@ def main():
         sys.exit(1)
 
     before, _, tail = readme.partition(BLOCK_START)
-    _, _, after = tail.partition(BLOCK_END)
-
-    new_readme = before + BLOCK_START + "\n" + new_block + BLOCK_END + after
+    old_block, _, after = tail.partition(BLOCK_END)
 
-    if new_readme != readme:
-        with open(README_PATH, "w", encoding="utf-8") as f:
-            f.write(new_readme)
-        print("[INFO] updated", README_PATH)
-    else:
+    # 先頭の「最終更新」行は毎回変わるので除き、それ以外が同じならファイルに触らない（mtimeも変えない）
+    old_stamp, _, old_rest = old_block.lstrip("\n").partition("\n\n")
+    if old_stamp.startswith("最終更新:") and _matches_fragments(old_rest, md[1:]):
         print("[INFO] no change")
+        return
+
+    # 大きな文字列を組み立てず、断片をそのまま一時ファイルへ流して差し替える
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(README_PATH) or ".",
+                                     delete=False) as f:
+        f.write(before)
+        f.write(BLOCK_START + "\n")
+        for part in md:
+            f.write(part)
+        f.write(BLOCK_END)
+        f.write(after)
+    shutil.copymode(README_PATH, f.name)
+    os.replace(f.name, README_PATH)
+    print("[INFO] updated", README_PATH)
 
 
 if __name__ == "__main__":